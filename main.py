@@ -1,18 +1,35 @@
 import os
-import json
-from supabase import create_client
+import asyncio
+import hashlib
+from collections import deque
+import orjson
+import ijson
+import httpx
+from supabase import acreate_client, AClient, AsyncClientOptions
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+# Records are queued by the caller and written to file/console on a background thread
+log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+file_handler = logging.FileHandler("menu_import.log", encoding='utf-8')
+file_handler.setFormatter(log_formatter)
+stream_handler = logging.StreamHandler()
+stream_handler.setFormatter(log_formatter)
+
+log_queue = queue.Queue(-1)
+log_listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+
+# QueueHandler only needs the bare message; the listener's handlers apply log_formatter
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("menu_import.log", encoding='utf-8'),
-        logging.StreamHandler()
-    ]
+    format='%(message)s',
+    handlers=[QueueHandler(log_queue)]
 )
 logger = logging.getLogger()
+log_listener.start()
 
 load_dotenv()
 
@@ -21,27 +38,79 @@ SUPABASE_KEY = os.getenv("SUPABASE_API_KEY")
 
 if not SUPABASE_URL or not SUPABASE_KEY:
     logger.error("Supabase credentials not found in .env file")
+    log_listener.stop()
     raise ValueError("Missing Supabase credentials. Please check your .env file.")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# PostgREST caps responses (1000 rows by default), so restaurants are read in pages
+PAGE_SIZE = 1000
+
+# Seconds before a Supabase request times out
+HTTP_TIMEOUT = 30
+
+# Shared pool so parallel uploads reuse keep-alive (HTTP/2) connections
+HTTP_MAX_CONNECTIONS = 32
+
+# Bulk update requests in flight at once, kept under the pooler's connection cap
+MAX_CONCURRENT_UPDATES = 8
 
 MENU_DIR = os.getenv("MENU_DIR")
 
-def get_json_files(directory):
-    json_files = []
-    for file in os.listdir(directory):
-        if file.endswith(".json"):
-            json_files.append(file)
-    return json_files
+# Bulk update requests are cut at whichever limit is hit first: row count or total
+# menu file size. A single menu larger than the byte cap is sent on its own.
+UPDATE_BATCH_SIZE = 500
+UPDATE_BATCH_BYTES = 5_000_000
+
+# Upper bound on threads used to read menu files concurrently; also the number of
+# loaded menus allowed to wait for the consumer
+MAX_LOAD_WORKERS = 32
+
+# Files above this size are stream-parsed instead of read whole
+LARGE_MENU_BYTES = 10_000_000
 
-def extract_restaurant_name(filename):
-    return os.path.splitext(filename)[0]
+def iter_json_files(directory):
+    """Yield (restaurant_name, file_path) for every .json file in directory."""
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(".json"):
+            yield entry.name[:-len(".json")], entry.path
+
+def hash_menu(raw):
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+class HashingReader:
+    """File wrapper that hashes bytes as they are read, so a streamed file is read once."""
+
+    def __init__(self, file):
+        self.file = file
+        self.digest = hashlib.blake2b(digest_size=16)
+
+    def read(self, size=-1):
+        chunk = self.file.read(size)
+        self.digest.update(chunk)
+        return chunk
+
+def stream_menu_data(file):
+    reader = HashingReader(file)
+    # use_float keeps numbers JSON-serializable (ijson defaults to Decimal)
+    items = ijson.items(reader, "", use_float=True)
+    menu_data = next(items)
+    # Draining reads to EOF, so trailing data raises like orjson.loads does
+    for _ in items:
+        pass
+    return menu_data, reader.digest.hexdigest()
 
 def load_menu_data(file_path):
+    """
+    Return (menu_data, menu_hash, size_bytes) for a menu file, or None if it can't be loaded.
+    size_bytes is the file size, used to budget upload batches without re-serializing.
+    """
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return json.load(file)
-    except json.JSONDecodeError:
+        with open(file_path, 'rb') as file:
+            size_bytes = os.fstat(file.fileno()).st_size
+            if size_bytes > LARGE_MENU_BYTES:
+                return (*stream_menu_data(file), size_bytes)
+            raw = file.read()
+        return orjson.loads(raw), hash_menu(raw), len(raw)
+    except (orjson.JSONDecodeError, ijson.JSONError):
         logger.error(f"Error parsing JSON file: {file_path}")
         return None
     except Exception as e:
@@ -49,65 +118,164 @@ def load_menu_data(file_path):
         return None
 
 
-def update_restaurant_menu(restaurant_name, menu_data):
-    try:
-        # Check if the restaurant exists
-        result = (
-            supabase.table("restaurants")
-            .select("id")
-            .eq("name", restaurant_name)
-            .execute()
-        )
+def create_http_client():
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+        ),
+        http2=True,
+        timeout=HTTP_TIMEOUT,
+    )
 
-        if not result.data:
-            logger.warning(f"No restaurant found with name: {restaurant_name}")
-            return False
 
-        update_result = (
-            supabase.table("restaurants")
-            .update({"menus": menu_data})
-            .eq("name", restaurant_name)
+async def create_supabase_client(http_client):
+    return await acreate_client(
+        SUPABASE_URL,
+        SUPABASE_KEY,
+        options=AsyncClientOptions(
+            postgrest_client_timeout=HTTP_TIMEOUT,
+            storage_client_timeout=HTTP_TIMEOUT,
+            httpx_client=http_client,
+        ),
+    )
+
+
+async def get_restaurant_menu_hashes(supabase: AClient):
+    """Return {name: menu_hash} for every restaurant, reading the table page by page."""
+    restaurants_table = supabase.table("restaurants")
+    menu_hashes = {}
+    offset = 0
+    while True:
+        result = await (
+            restaurants_table
+            .select("name, menu_hash")
+            .order("id")
+            .range(offset, offset + PAGE_SIZE - 1)
             .execute()
         )
+        menu_hashes.update((row["name"], row["menu_hash"]) for row in result.data)
+        if len(result.data) < PAGE_SIZE:
+            return menu_hashes
+        offset += PAGE_SIZE
+
 
-        if update_result.data:
-            logger.info(f"Successfully updated menu for {restaurant_name}")
-            return True
+async def update_restaurant_menu_batch(supabase: AClient, batch):
+    success_count = 0
+    failure = 0
+
+    try:
+        # Server-side UPDATE ... FROM jsonb_to_recordset, see sql/bulk_update_menus.sql
+        result = await supabase.rpc("bulk_update_menus", {"payload": batch}).execute()
+    except Exception as e:
+        logger.error(f"Error updating batch of {len(batch)} restaurants: {str(e)}")
+        return 0, len(batch)
+
+    updated = {row["name"] for row in result.data or []}
+    for row in batch:
+        if row["name"] in updated:
+            logger.info(f"Successfully updated menu for {row['name']}")
+            success_count += 1
         else:
-            logger.warning(f"Update operation returned no data for {restaurant_name}")
-            return False
+            logger.warning(f"Update operation returned no data for {row['name']}")
+            failure += 1
+
+    return success_count, failure
+
+
+async def iter_loaded_menus(pending):
+    """
+    Yield (restaurant_name, load_menu_data result) in order, reading files on a thread pool.
+    At most MAX_LOAD_WORKERS files are loaded ahead of the consumer.
+    """
+    loop = asyncio.get_running_loop()
+    window = deque()
+    with ThreadPoolExecutor(max_workers=MAX_LOAD_WORKERS) as executor:
+        for restaurant_name, file_path in pending:
+            window.append((restaurant_name, loop.run_in_executor(executor, load_menu_data, file_path)))
+            if len(window) >= MAX_LOAD_WORKERS:
+                restaurant_name, future = window.popleft()
+                yield restaurant_name, await future
 
+        while window:
+            restaurant_name, future = window.popleft()
+            yield restaurant_name, await future
+
+async def import_menus(supabase: AClient):
+    try:
+        menu_hashes = await get_restaurant_menu_hashes(supabase)
     except Exception as e:
-        logger.error(f"Error updating restaurant {restaurant_name}: {str(e)}")
-        return False
+        logger.error(f"Error fetching existing restaurants: {str(e)}")
+        return
 
-def main():
-    json_files = get_json_files(MENU_DIR)
+    json_files = list(iter_json_files(MENU_DIR))
     logger.info(f"Found {len(json_files)} JSON files to process")
 
-    success_count = 0
     failure = 0
+    unchanged = 0
+    pending = []
 
-    for json_file in json_files:
-        restaurant_name = extract_restaurant_name(json_file)
-        file_path = os.path.join(MENU_DIR, json_file)
+    for restaurant_name, file_path in json_files:
         logger.info(f"Processing {restaurant_name} from {file_path}")
 
-        menu_data = load_menu_data(file_path)
-        if menu_data is None:
-            logger.error(f"Skipping {restaurant_name} due to data loading error")
+        if restaurant_name not in menu_hashes:
+            logger.warning(f"No restaurant found with name: {restaurant_name}")
             failure += 1
             continue
 
-        success = update_restaurant_menu(restaurant_name, menu_data)
-        if success:
-            success_count += 1
-        else:
+        pending.append((restaurant_name, file_path))
+
+    # Batches are uploaded as soon as they fill. Waiting for a free upload slot pauses
+    # loading, so memory is bounded by in-flight batches, not by the whole import.
+    upload_slots = asyncio.Semaphore(MAX_CONCURRENT_UPDATES)
+    uploads = []
+
+    async def start_upload(batch):
+        await upload_slots.acquire()
+        upload = asyncio.create_task(update_restaurant_menu_batch(supabase, batch))
+        upload.add_done_callback(lambda _: upload_slots.release())
+        uploads.append(upload)
+
+    batch = []
+    batch_bytes = 0
+    async for restaurant_name, loaded in iter_loaded_menus(pending):
+        if loaded is None:
+            logger.error(f"Skipping {restaurant_name} due to data loading error")
             failure += 1
+            continue
 
-    logger.info(f"Import complete. Successful: {success_count}, Failed: {failure}")
+        menu_data, menu_hash, size_bytes = loaded
+        if menu_hashes[restaurant_name] == menu_hash:
+            logger.info(f"Menu for {restaurant_name} is unchanged, skipping")
+            unchanged += 1
+            continue
 
+        if batch and (len(batch) >= UPDATE_BATCH_SIZE or batch_bytes + size_bytes > UPDATE_BATCH_BYTES):
+            await start_upload(batch)
+            batch = []
+            batch_bytes = 0
 
-if __name__ == "__main__":
-    main()
+        batch.append({"name": restaurant_name, "menus": menu_data, "menu_hash": menu_hash})
+        batch_bytes += size_bytes
+
+    if batch:
+        await start_upload(batch)
+
+    results = await asyncio.gather(*uploads)
+    success_count = sum(success for success, _ in results)
+    failure += sum(failed for _, failed in results)
 
+    logger.info(f"Import complete. Successful: {success_count}, Unchanged: {unchanged}, Failed: {failure}")
+
+
+async def main():
+    async with create_http_client() as http_client:
+        supabase = await create_supabase_client(http_client)
+        await import_menus(supabase)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    finally:
+        log_listener.stop()
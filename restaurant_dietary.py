@@ -1,8 +1,13 @@
 import os
 import sys
+import csv
 import logging
+from collections import defaultdict
+from types import MappingProxyType
+from dataclasses import dataclass, field
 from supabase import create_client, Client
-from typing import List, Dict, Optional
+from postgrest.exceptions import APIError
+from typing import List, Dict, DefaultDict, Iterable, Iterator, Mapping, Optional, Set, Tuple
 from dotenv import load_dotenv
 
 # Supabase connection details
@@ -11,6 +16,15 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_API_KEY")
 
+# PostgREST caps responses (1000 rows by default), so larger tables are read in pages
+PAGE_SIZE = 1000
+
+# Names per `in` filter; the filter travels in the URL, so very long lists are split
+IN_FILTER_CHUNK_SIZE = 100
+
+# Relationships per bulk upsert request, keeps large CSV imports under request-size limits
+UPSERT_CHUNK_SIZE = 500
+
 
 # Setup logging
 def setup_logging(console_output=False):
@@ -59,67 +73,121 @@ except Exception as e:
     logger.error(f"Failed to connect to Supabase: {e}")
     sys.exit(1)
 
+# Table handles are built once and reused; each query starts its own builder from them
+restaurants_table = supabase.table("restaurants")
+dietary_options_table = supabase.table("dietary_options")
+restaurant_dietary_options_table = supabase.table("restaurant_dietary_options")
+
+
+# ANSI sequence: erase display, move cursor home
+CLEAR_SCREEN_SEQUENCE = "\x1b[2J\x1b[H"
+
+if os.name == 'nt':
+    # Empty command makes the Windows 10+ console process ANSI escape sequences
+    os.system('')
+
 
 def clear_screen():
-    """Clear the terminal screen based on OS."""
-    os.system('cls' if os.name == 'nt' else 'clear')
+    """Clear the terminal screen, skipped when stdout is not a terminal."""
+    if sys.stdout.isatty():
+        sys.stdout.write(CLEAR_SCREEN_SEQUENCE)
+        sys.stdout.flush()
 
 
-def get_restaurants() -> Dict[str, str]:
+def fetch_all(table, columns: str, order_by: str, page_size: int = PAGE_SIZE) -> Iterator[Dict]:
     """
-    Fetch all restaurants from the database and return as a dictionary of name:id.
+    Yield every row of a table handle page by page, ordered by `order_by` so pages don't overlap.
+    Only one page is held at a time. Raises APIError if any page fails.
     """
-    logger.info("Fetching restaurants from database")
-    response = supabase.table("restaurants").select("id, name").execute()
+    offset = 0
+    while True:
+        page = table \
+            .select(columns) \
+            .order(order_by) \
+            .range(offset, offset + page_size - 1) \
+            .execute() \
+            .data
+
+        yield from page
+        if len(page) < page_size:
+            return
+        offset += page_size
 
-    if hasattr(response, 'error') and response.error:
-        logger.error(f"Error fetching restaurants: {response.error}")
-        print(f"Error fetching restaurants: {response.error}")
-        return {}
 
-    restaurants = {restaurant['name']: restaurant['id'] for restaurant in response.data}
+def get_restaurants() -> Mapping[str, str]:
+    """
+    Fetch all restaurants from the database and return a read-only mapping of name:id.
+    """
+    logger.info("Fetching restaurants from database")
+    restaurants = {restaurant['name']: restaurant['id']
+                   for restaurant in fetch_all(restaurants_table, "id, name", order_by="id")}
     logger.info(f"Found {len(restaurants)} restaurants")
-    return restaurants
+    return MappingProxyType(restaurants)
 
 
-def get_dietary_options() -> Dict[str, str]:
+def get_dietary_options() -> Mapping[str, str]:
     """
-    Fetch all dietary options from the database and return as a dictionary of name:id.
+    Fetch all dietary options from the database and return a read-only mapping of name:id.
     """
     logger.info("Fetching dietary options from database")
-    response = supabase.table("dietary_options").select("id, name").execute()
-
-    if hasattr(response, 'error') and response.error:
-        logger.error(f"Error fetching dietary options: {response.error}")
-        print(f"Error fetching dietary options: {response.error}")
-        return {}
-
-    dietary_options = {option['name']: option['id'] for option in response.data}
+    dietary_options = {option['name']: option['id']
+                       for option in fetch_all(dietary_options_table, "id, name", order_by="id")}
     logger.info(f"Found {len(dietary_options)} dietary options")
-    return dietary_options
+    return MappingProxyType(dietary_options)
 
 
-def get_existing_restaurant_dietary_options() -> List[Dict]:
+def get_restaurant_dietary_option_ids() -> DefaultDict[str, Set[str]]:
     """
-    Fetch existing restaurant-dietary option relationships.
+    Fetch existing restaurant-dietary option relationships, grouped as restaurant_id:{dietary_option_id}.
     """
     logger.info("Fetching existing restaurant-dietary option relationships")
-    response = supabase.table("restaurant_dietary_options").select("restaurant_id, dietary_option_id").execute()
+    options_by_restaurant = defaultdict(set)
+    relationship_count = 0
+    for relation in fetch_all(restaurant_dietary_options_table, "restaurant_id, dietary_option_id",
+                              order_by="restaurant_id,dietary_option_id"):
+        options_by_restaurant[relation['restaurant_id']].add(relation['dietary_option_id'])
+        relationship_count += 1
 
-    if hasattr(response, 'error') and response.error:
-        logger.error(f"Error fetching existing relationships: {response.error}")
-        print(f"Error fetching existing relationships: {response.error}")
-        return []
+    logger.info(f"Found {relationship_count} existing relationships")
+    return options_by_restaurant
 
-    logger.info(f"Found {len(response.data)} existing relationships")
-    return response.data
 
+def resolve_ids(table, names: Iterable[str]) -> Dict[str, str]:
+    """
+    Look up ids for the given names with `in` filters instead of one query per name.
+    Returns a dictionary of name:id; names that don't exist are left out.
+    """
+    unique_names = sorted(set(names))
+    ids = {}
+    for start in range(0, len(unique_names), IN_FILTER_CHUNK_SIZE):
+        response = table \
+            .select("id, name") \
+            .in_("name", unique_names[start:start + IN_FILTER_CHUNK_SIZE]) \
+            .execute()
+        ids.update({row['name']: row['id'] for row in response.data})
+    return ids
+
+
+def resolve_restaurant_ids(names: Iterable[str]) -> Dict[str, str]:
+    """
+    Fetch ids for the given restaurant names as a dictionary of name:id.
+    """
+    return resolve_ids(restaurants_table, names)
 
-def add_dietary_option_to_restaurant(restaurant_id: str, dietary_option_id: str, restaurant_name: str = "",
-                                     option_name: str = "") -> bool:
+
+def resolve_option_ids(names: Iterable[str]) -> Dict[str, str]:
+    """
+    Fetch ids for the given dietary option names as a dictionary of name:id.
+    """
+    return resolve_ids(dietary_options_table, names)
+
+
+def add_dietary_option_to_restaurant(restaurant_id: str, dietary_option_id: str, restaurant_option_ids: Set[str],
+                                     restaurant_name: str = "", option_name: str = "") -> bool:
     """
     Add a dietary option to a restaurant in the junction table.
-    Returns True if successful, False otherwise.
+    `restaurant_option_ids` holds the restaurant's known dietary option ids and is updated on success.
+    Returns True if added, False if it was already associated. Raises APIError on failure.
     """
     # Use names for better logging if provided
     restaurant_log = restaurant_name if restaurant_name else restaurant_id
@@ -128,84 +196,174 @@ def add_dietary_option_to_restaurant(restaurant_id: str, dietary_option_id: str,
     logger.info(f"Attempting to associate dietary option '{option_log}' with restaurant '{restaurant_log}'")
 
     # Check if this relationship already exists
-    existing = supabase.table("restaurant_dietary_options") \
-        .select("*") \
-        .eq("restaurant_id", restaurant_id) \
-        .eq("dietary_option_id", dietary_option_id) \
-        .execute()
-
-    if hasattr(existing, 'error') and existing.error:
-        error_msg = f"Error checking existing relationship: {existing.error}"
-        logger.error(error_msg)
-        print(error_msg)
-        return False
-
-    if existing.data and len(existing.data) > 0:
+    if dietary_option_id in restaurant_option_ids:
         logger.info(f"Dietary option '{option_log}' is already associated with restaurant '{restaurant_log}'")
         print("This dietary option is already associated with this restaurant.")
         return False
 
-    # Insert the new relationship
-    response = supabase.table("restaurant_dietary_options").insert({
+    # Insert the new relationship, ON CONFLICT DO NOTHING covers rows added since startup
+    response = restaurant_dietary_options_table.upsert({
         "restaurant_id": restaurant_id,
         "dietary_option_id": dietary_option_id
-    }).execute()
+    }, on_conflict="restaurant_id,dietary_option_id", ignore_duplicates=True).execute()
+
+    restaurant_option_ids.add(dietary_option_id)
 
-    if hasattr(response, 'error') and response.error:
-        error_msg = f"Error adding relationship: {response.error}"
-        logger.error(error_msg)
-        print(error_msg)
+    if not response.data:
+        logger.info(f"Dietary option '{option_log}' is already associated with restaurant '{restaurant_log}'")
+        print("This dietary option is already associated with this restaurant.")
         return False
 
     logger.info(f"Successfully added dietary option '{option_log}' to restaurant '{restaurant_log}'")
     return True
 
 
-def display_restaurant_dietary_options(restaurant_id: str, restaurant_name: str, dietary_options: Dict[str, str]):
+def add_dietary_options_to_restaurants(pairs: Iterable[Tuple[str, str]]) -> int:
     """
-    Display all dietary options for a specific restaurant.
+    Add (restaurant_id, dietary_option_id) pairs to the junction table, UPSERT_CHUNK_SIZE per request.
+    Pairs that already exist are skipped. Returns the number of relationships added.
+    Raises APIError on failure; chunks sent before the failure stay applied.
+    """
+    payload = [
+        {"restaurant_id": restaurant_id, "dietary_option_id": dietary_option_id}
+        for restaurant_id, dietary_option_id in sorted(set(pairs))
+    ]
+
+    added = 0
+    for start in range(0, len(payload), UPSERT_CHUNK_SIZE):
+        response = restaurant_dietary_options_table.upsert(
+            payload[start:start + UPSERT_CHUNK_SIZE],
+            on_conflict="restaurant_id,dietary_option_id",
+            ignore_duplicates=True
+        ).execute()
+        added += len(response.data)
+    return added
+
+
+def display_restaurant_dietary_options(restaurant_name: str, restaurant_option_ids: Set[str],
+                                       id_to_option_name: Dict[str, str]):
+    """
+    Display all dietary options for a specific restaurant from the prefetched option ids.
     """
-    logger.info(f"Fetching dietary options for restaurant '{restaurant_name}'")
-    response = supabase.table("restaurant_dietary_options") \
-        .select("dietary_option_id") \
-        .eq("restaurant_id", restaurant_id) \
-        .execute()
-
-    if hasattr(response, 'error') and response.error:
-        error_msg = f"Error fetching dietary options for restaurant: {response.error}"
-        logger.error(error_msg)
-        print(error_msg)
-        return
-
-    # Create a reverse mapping of id:name for dietary options
-    id_to_name = {v: k for k, v in dietary_options.items()}
-
     print(f"\nCurrent dietary options for {restaurant_name}:")
-    if not response.data:
+    if not restaurant_option_ids:
         print("None")
         logger.info(f"Restaurant '{restaurant_name}' has no dietary options")
     else:
-        current_options = []
-        for item in response.data:
-            option_id = item['dietary_option_id']
-            if option_id in id_to_name:
-                option_name = id_to_name[option_id]
-                current_options.append(option_name)
-                print(f"- {option_name}")
+        current_options = sorted(
+            id_to_option_name[option_id] for option_id in restaurant_option_ids
+            if option_id in id_to_option_name
+        )
+        for option_name in current_options:
+            print(f"- {option_name}")
 
         logger.info(
             f"Restaurant '{restaurant_name}' has {len(current_options)} dietary options: {', '.join(current_options)}")
 
 
-def list_all_dietary_options(dietary_options: Dict[str, str]):
+@dataclass(slots=True)
+class CatalogState:
+    """
+    Lookup data loaded once at startup and shared across CLI screens.
     """
-    Display all available dietary options.
+    restaurants: Mapping[str, str]
+    dietary_options: Mapping[str, str]
+    options_by_restaurant: DefaultDict[str, Set[str]]
+    sorted_restaurant_names: List[str] = field(init=False)
+    sorted_option_names: List[str] = field(init=False)
+    id_to_option_name: Dict[str, str] = field(init=False)
+    restaurants_ci: Dict[str, str] = field(init=False)
+    dietary_options_ci: Dict[str, str] = field(init=False)
+
+    def __post_init__(self):
+        # Sort names once; reused for display and number-to-name lookups
+        self.sorted_restaurant_names = sorted(self.restaurants)
+        self.sorted_option_names = sorted(self.dietary_options)
+        self.id_to_option_name = {v: k for k, v in self.dietary_options.items()}
+        # casefold -> canonical name, for case-insensitive input
+        self.restaurants_ci = {name.casefold(): name for name in self.restaurants}
+        self.dietary_options_ci = {name.casefold(): name for name in self.dietary_options}
+
+    def resolve_restaurant(self, name: str) -> Optional[str]:
+        """
+        Return the canonical restaurant name for user input, preferring an exact match.
+        """
+        if name in self.restaurants:
+            return name
+        return self.restaurants_ci.get(name.casefold())
+
+    def resolve_dietary_option(self, name: str) -> Optional[str]:
+        """
+        Return the canonical dietary option name for user input, preferring an exact match.
+        """
+        if name in self.dietary_options:
+            return name
+        return self.dietary_options_ci.get(name.casefold())
+
+
+def list_all_dietary_options(sorted_option_names: List[str]):
+    """
+    Display all available dietary options from the pre-sorted list of names.
     """
     print("\nAvailable dietary options:")
-    for i, option in enumerate(sorted(dietary_options.keys()), 1):
+    for i, option in enumerate(sorted_option_names, 1):
         print(f"{i}. {option}")
 
 
+def import_dietary_options_csv(csv_path: str):
+    """
+    Bulk-assign dietary options from a CSV file with `restaurant` and `dietary_option` columns.
+    Names are matched exactly (case-sensitive); rows with a blank cell are skipped.
+    """
+    logger.info(f"Importing dietary options from '{csv_path}'")
+    assignments = []
+    try:
+        with open(csv_path, newline='', encoding='utf-8-sig') as csv_file:
+            reader = csv.DictReader(csv_file)
+            missing_columns = {'restaurant', 'dietary_option'} - set(reader.fieldnames or [])
+            if missing_columns:
+                logger.error(f"CSV file '{csv_path}' is missing columns: {', '.join(sorted(missing_columns))}")
+                print(f"CSV file '{csv_path}' is missing columns: {', '.join(sorted(missing_columns))}")
+                return
+
+            for row in reader:
+                restaurant = (row['restaurant'] or '').strip()
+                option = (row['dietary_option'] or '').strip()
+                if not restaurant or not option:
+                    logger.warning(f"Skipping line {reader.line_num} of '{csv_path}': missing restaurant or dietary option")
+                    print(f"Skipping line {reader.line_num}: missing restaurant or dietary option.")
+                    continue
+                assignments.append((restaurant, option))
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        logger.error(f"Error reading CSV file '{csv_path}': {e}")
+        print(f"Error reading CSV file '{csv_path}': {e}")
+        return
+
+    try:
+        restaurant_ids = resolve_restaurant_ids(restaurant for restaurant, _ in assignments)
+        option_ids = resolve_option_ids(option for _, option in assignments)
+
+        pairs = []
+        for restaurant, option in assignments:
+            if restaurant not in restaurant_ids:
+                logger.warning(f"Restaurant '{restaurant}' not found in database, skipping")
+                print(f"Restaurant '{restaurant}' not found, skipping.")
+            elif option not in option_ids:
+                logger.warning(f"Dietary option '{option}' not found in database, skipping")
+                print(f"Dietary option '{option}' not found, skipping.")
+            else:
+                pairs.append((restaurant_ids[restaurant], option_ids[option]))
+
+        added = add_dietary_options_to_restaurants(pairs)
+    except APIError as e:
+        logger.error(f"Error importing dietary options: {e.message}")
+        print(f"Error importing dietary options: {e.message}")
+        return
+
+    logger.info(f"Imported {len(assignments)} rows from '{csv_path}': {added} relationships added")
+    print(f"Added {added} dietary option relationships from {len(assignments)} rows.")
+
+
 def main():
     """
     Main function that runs the CLI.
@@ -213,8 +371,14 @@ def main():
     logger.info("Starting Restaurant Dietary Options Manager")
     try:
         # Fetch all restaurants and dietary options once at startup
-        restaurants = get_restaurants()
-        dietary_options = get_dietary_options()
+        try:
+            restaurants = get_restaurants()
+            dietary_options = get_dietary_options()
+            options_by_restaurant = get_restaurant_dietary_option_ids()
+        except APIError as e:
+            logger.error(f"Error loading data from database: {e.message}")
+            print(f"Error loading data from database: {e.message}")
+            return
 
         if not restaurants:
             logger.error("No restaurants found in the database")
@@ -226,6 +390,8 @@ def main():
             print("No dietary options found in the database. Please add dietary options first.")
             return
 
+        state = CatalogState(restaurants, dietary_options, options_by_restaurant)
+
         logger.info(f"Successfully loaded {len(restaurants)} restaurants and {len(dietary_options)} dietary options")
         print(f"Found {len(restaurants)} restaurants and {len(dietary_options)} dietary options.")
 
@@ -237,24 +403,23 @@ def main():
 
             # Display all restaurants
             print("\nAvailable restaurants:")
-            for i, name in enumerate(sorted(restaurants.keys()), 1):
+            for i, name in enumerate(state.sorted_restaurant_names, 1):
                 print(f"{i}. {name}")
 
             # Get restaurant selection
             print("\nEnter restaurant name or number (or 'exit' to quit):")
             restaurant_input = input("> ").strip()
 
-            if restaurant_input.lower() in ['exit', 'quit', 'q']:
+            if restaurant_input.casefold() in ['exit', 'quit', 'q']:
                 logger.info("User selected to exit program")
                 break
 
             # Handle numeric input
             if restaurant_input.isdigit():
                 idx = int(restaurant_input) - 1
-                sorted_names = sorted(restaurants.keys())
-                if 0 <= idx < len(sorted_names):
+                if 0 <= idx < len(state.sorted_restaurant_names):
                     logger.info(f"User selected restaurant #{restaurant_input}")
-                    restaurant_input = sorted_names[idx]
+                    restaurant_input = state.sorted_restaurant_names[idx]
                     logger.info(f"Translated to restaurant name: '{restaurant_input}'")
                 else:
                     logger.warning(f"User provided invalid restaurant number: {restaurant_input}")
@@ -263,11 +428,13 @@ def main():
                     continue
 
             # Validate restaurant exists
-            if restaurant_input not in restaurants:
+            restaurant_name = state.resolve_restaurant(restaurant_input)
+            if restaurant_name is None:
                 logger.warning(f"Restaurant '{restaurant_input}' not found in database")
                 print(f"Restaurant '{restaurant_input}' not found.")
                 input("Press Enter to continue...")
                 continue
+            restaurant_input = restaurant_name
 
             logger.info(f"Selected restaurant: '{restaurant_input}'")
 
@@ -279,28 +446,29 @@ def main():
                 print(f"Managing dietary options for: {restaurant_input}")
 
                 # Display current dietary options for this restaurant
-                display_restaurant_dietary_options(restaurant_id, restaurant_input, dietary_options)
+                display_restaurant_dietary_options(restaurant_input, state.options_by_restaurant[restaurant_id],
+                                                   state.id_to_option_name)
 
                 # Display available options
-                list_all_dietary_options(dietary_options)
+                list_all_dietary_options(state.sorted_option_names)
 
                 print("\nEnter dietary option name or number (or 'done' to go back, 'exit' to quit):")
                 option_input = input("> ").strip()
 
-                if option_input.lower() == 'done':
+                command = option_input.casefold()
+                if command == 'done':
                     logger.info(f"Finished adding options to restaurant '{restaurant_input}'")
                     break
-                elif option_input.lower() in ['exit', 'quit', 'q']:
+                elif command in ['exit', 'quit', 'q']:
                     logger.info("User chose to exit program")
                     return
 
                 # Handle numeric input
                 if option_input.isdigit():
                     idx = int(option_input) - 1
-                    sorted_options = sorted(dietary_options.keys())
-                    if 0 <= idx < len(sorted_options):
+                    if 0 <= idx < len(state.sorted_option_names):
                         logger.info(f"User selected option #{option_input}")
-                        option_input = sorted_options[idx]
+                        option_input = state.sorted_option_names[idx]
                         logger.info(f"Translated to option name: '{option_input}'")
                     else:
                         logger.warning(f"User provided invalid option number: {option_input}")
@@ -309,15 +477,28 @@ def main():
                         continue
 
                 # Validate dietary option exists
-                if option_input not in dietary_options:
+                option_name = state.resolve_dietary_option(option_input)
+                if option_name is None:
                     logger.warning(f"Dietary option '{option_input}' not found in database")
                     print(f"Dietary option '{option_input}' not found.")
                     input("Press Enter to continue...")
                     continue
+                option_input = option_name
 
                 # Add the relationship
                 option_id = dietary_options[option_input]
-                if add_dietary_option_to_restaurant(restaurant_id, option_id, restaurant_input, option_input):
+                try:
+                    added = add_dietary_option_to_restaurant(restaurant_id, option_id,
+                                                             state.options_by_restaurant[restaurant_id],
+                                                             restaurant_input, option_input)
+                except APIError as e:
+                    error_msg = f"Error adding relationship: {e.message}"
+                    logger.error(error_msg)
+                    print(error_msg)
+                    input("Press Enter to continue...")
+                    continue
+
+                if added:
                     print(f"Added '{option_input}' to '{restaurant_input}'")
                     logger.info(f"Successfully added '{option_input}' to '{restaurant_input}'")
 
@@ -349,4 +530,12 @@ if __name__ == "__main__":
         # Setup logger again with console output
         logger = setup_logging(console_output=True)
 
-    main()
\ No newline at end of file
+    # Check if a CSV file was given for bulk import
+    if "--import" in sys.argv:
+        import_index = sys.argv.index("--import") + 1
+        if import_index >= len(sys.argv) or sys.argv[import_index].startswith("-"):
+            print("Usage: restaurant_dietary.py --import <file.csv>")
+            sys.exit(1)
+        import_dietary_options_csv(sys.argv[import_index])
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,14 @@
+-- Applies a batch of menu updates in one statement.
+-- payload: [{"name": ..., "menus": {...}, "menu_hash": ...}, ...]
+-- Returns the names of the restaurants that were updated.
+create or replace function bulk_update_menus(payload jsonb)
+returns table (name text)
+language sql
+as $$
+    update restaurants r
+    set menus = p.menus,
+        menu_hash = p.menu_hash
+    from jsonb_to_recordset(payload) as p(name text, menus jsonb, menu_hash text)
+    where r.name = p.name
+    returning r.name::text;
+$$;
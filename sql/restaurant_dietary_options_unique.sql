@@ -0,0 +1,5 @@
+-- Required by the ON CONFLICT (restaurant_id, dietary_option_id) upserts in
+-- restaurant_dietary.py. Remove any duplicate pairs before adding it.
+alter table restaurant_dietary_options
+    add constraint restaurant_dietary_options_restaurant_option_key
+    unique (restaurant_id, dietary_option_id);
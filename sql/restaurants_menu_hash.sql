@@ -0,0 +1,2 @@
+-- Stores the hash of the last imported menu file so main.py can skip unchanged menus.
+alter table restaurants add column if not exists menu_hash text;